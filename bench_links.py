@@ -0,0 +1,66 @@
+import re
+import sys
+import time
+from urllib.parse import urljoin
+
+from multi_scraler import extract_links_from_html, normalize_url, resolve_link
+
+def legacy_extract_links(html: str, base_url: str):
+    links = set()
+
+    for match in re.finditer(r'href="([^"]*)"', html, re.IGNORECASE):
+        href = match.group(1)
+
+        if not href or href.startswith(('#', 'javascript:', 'mailto:')):
+            continue
+
+        full_url = urljoin(base_url, href)
+        if 'lib.ru' in full_url:
+            links.add(normalize_url(full_url))
+
+    return list(links)
+
+def bench(fn, pages, rounds):
+    # Каждый прогон - один проход по страницам с холодным кешем, как при реальном обходе,
+    # где каждая страница скачивается один раз
+    best = None
+    for _ in range(rounds):
+        resolve_link.cache_clear()
+        started = time.perf_counter()
+        for base_url, html in pages:
+            fn(html, base_url)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(paths, rounds=5):
+    # Файлы - сохранённые страницы lib.ru; базовый URL берётся из имени файла
+    # (например lib.ru_PROZA_.html -> https://lib.ru/PROZA/)
+    pages = []
+    for path in paths:
+        with open(path, "r", encoding="koi8-r", errors="ignore") as f:
+            html = f.read()
+        name = path.rsplit("/", 1)[-1].rsplit(".html", 1)[0]
+        pages.append(("https://" + name.replace("_", "/"), html))
+
+    hosts = ("lib.ru",)
+    new_extract = lambda html, base: extract_links_from_html(html, base, "libru", hosts)
+
+    legacy = bench(legacy_extract_links, pages, rounds)
+    fast = bench(new_extract, pages, rounds)
+    cache = resolve_link.cache_info()
+
+    only_legacy = only_fast = 0
+    for base_url, html in pages:
+        old, new = set(legacy_extract_links(html, base_url)), set(new_extract(html, base_url))
+        only_legacy += len(old - new)
+        only_fast += len(new - old)
+
+    print(f"страниц: {len(pages)}, лучший из {rounds} проходов с холодным кешем")
+    print(f"старый вариант: {legacy:.3f} сек")
+    print(f"новый вариант:  {fast:.3f} сек (x{legacy / fast:.1f})")
+    print(f"кеш ссылок за проход: hits={cache.hits}, misses={cache.misses}")
+    print(f"ссылки только в старом: {only_legacy}, только в новом: {only_fast}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
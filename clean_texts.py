@@ -20,6 +20,10 @@ def clean_html(html: str) -> str:
 
     return text
 
+def ensure_clean_indexes(db):
+    db.documents_clean.create_index([("url_norm", ASCENDING)], unique=True)
+    db.documents_clean.create_index([("source", ASCENDING)])
+
 def main(cfg_path: str):
     with open(cfg_path, "r", encoding="utf-8") as f:
         cfg = yaml.safe_load(f)
@@ -30,8 +34,7 @@ def main(cfg_path: str):
     src = db["documents"]
     dst = db["documents_clean"]
 
-    dst.create_index([("url_norm", ASCENDING)], unique=True)
-    dst.create_index([("source", ASCENDING)])
+    ensure_clean_indexes(db)
 
     cur = src.find(
         {"raw_html": {"$exists": True}},
@@ -1,14 +1,20 @@
 import time
+import math
 import yaml
 import hashlib
 import requests
 import re
 from urllib.parse import urlsplit, urlunsplit, urldefrag, urljoin
-from pymongo import MongoClient, ASCENDING, ReturnDocument
+from pymongo import MongoClient, ASCENDING, ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
 import sys
+import os
+import socket
+import uuid
 import threading
+import multiprocessing
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 import logging
 from datetime import datetime
 import traceback
@@ -51,8 +57,152 @@ def ensure_indexes(db):
     db.queue.create_index([("status", ASCENDING), ("next_fetch_at", ASCENDING)])
     db.queue.create_index([("source", ASCENDING), ("status", ASCENDING)])
     db.queue.create_index([("priority", ASCENDING), ("status", ASCENDING), ("next_fetch_at", ASCENDING)])
+    db.queue.create_index([("shard", ASCENDING), ("status", ASCENDING), ("next_fetch_at", ASCENDING)])
+    db.crawlers.create_index([("heartbeat_at", ASCENDING)])
 
-def queue_put(db, source: str, url: str, priority: int = 2, next_fetch_at: int | None = None):
+SHARD_DEFAULTS = {
+    "enabled": False,
+    "partitions": 64,
+    "by": "url",
+    "heartbeat_seconds": 10,
+    "ttl_seconds": 30,
+    "host_interval_seconds": 0,
+    "processes": 1,
+}
+
+def shard_settings(cfg) -> dict:
+    sc = dict(SHARD_DEFAULTS)
+    sc.update(cfg["logic"].get("shard") or {})
+    return sc
+
+def shard_key(shard_cfg: dict) -> str:
+    # Схема шардирования, по которой посчитан shard задачи
+    return f"{shard_cfg['by']}:{shard_cfg['partitions']}"
+
+def shard_of(url_norm: str, shard_cfg: dict) -> int:
+    key = urlsplit(url_norm).netloc if shard_cfg["by"] == "host" else url_norm
+    # hash() рандомизирован между процессами, поэтому нужен стабильный хеш
+    digest = hashlib.md5(key.encode("utf-8", errors="ignore")).digest()
+    return int.from_bytes(digest[:8], "big") % shard_cfg["partitions"]
+
+def backfill_shards(db, shard_cfg: dict, batch_size: int = 1000) -> int:
+    key = shard_key(shard_cfg)
+    cur = db.queue.find({"shard_key": {"$ne": key}}, {"url_norm": 1}).batch_size(batch_size)
+    
+    ops = []
+    updated = 0
+    for q in cur:
+        ops.append(UpdateOne(
+            {"_id": q["_id"]},
+            {"$set": {"shard": shard_of(q["url_norm"], shard_cfg), "shard_key": key}}
+        ))
+        if len(ops) >= batch_size:
+            updated += db.queue.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += db.queue.bulk_write(ops, ordered=False).modified_count
+    
+    return updated
+
+class ShardCoordinator:
+    def __init__(self, db, shard_cfg: dict):
+        self.db = db
+        self.cfg = shard_cfg
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.members = []
+        self._owned = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def owned(self):
+        with self._lock:
+            return list(self._owned)
+    
+    def _alive(self, op: str) -> dict:
+        # Живость считается по часам сервера ($$NOW), как и слоты хостов:
+        # расхождение часов машин не должно выкидывать живые инстансы
+        ttl_ms = int(self.cfg["ttl_seconds"] * 1000)
+        return {"$expr": {op: ["$heartbeat_at", {"$subtract": ["$$NOW", ttl_ms]}]}}
+    
+    def heartbeat(self):
+        self.db.crawlers.update_one(
+            {"_id": self.instance_id},
+            [{"$set": {
+                "heartbeat_at": "$$NOW",
+                "started_at": {"$ifNull": ["$started_at", "$$NOW"]},
+                "host": {"$literal": socket.gethostname()},
+                "pid": os.getpid(),
+            }}],
+            upsert=True
+        )
+        self.db.crawlers.delete_many(self._alive("$lt"))
+        self.rebalance()
+    
+    def rebalance(self):
+        members = sorted(c["_id"] for c in self.db.crawlers.find(self._alive("$gte"), {"_id": 1}))
+        if self.instance_id not in members:
+            members.append(self.instance_id)
+            members.sort()
+        
+        idx = members.index(self.instance_id)
+        owned = [p for p in range(self.cfg["partitions"]) if p % len(members) == idx]
+        
+        with self._lock:
+            changed = owned != self._owned
+            self._owned = owned
+        
+        if changed or members != self.members:
+            logger.info(f"Шард {self.instance_id}: {len(owned)} партиций из "
+                        f"{self.cfg['partitions']}, инстансов {len(members)}")
+        self.members = members
+        
+        # Задачи, захваченные упавшими инстансами, возвращаем в очередь
+        self.db.queue.update_many(
+            {"status": "in_progress", "shard": {"$in": owned},
+             "claimed_by": {"$nin": members}},
+            {"$set": {"status": "pending", "updated_at": now_ts()}}
+        )
+    
+    def _run(self):
+        while not self._stop.wait(self.cfg["heartbeat_seconds"]):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"Ошибка heartbeat шарда: {e}")
+    
+    def start(self):
+        self.heartbeat()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.db.crawlers.delete_one({"_id": self.instance_id})
+
+def acquire_host_slot(db, host: str, interval: float) -> float:
+    # Общая для всех шардов вежливость: одна выборка на хост раз в interval секунд.
+    # Время берётся с сервера ($$NOW), чтобы расхождение часов машин не влияло на слоты
+    try:
+        db.hosts.update_one(
+            {"_id": host, "$expr": {"$lte": [{"$ifNull": ["$next_allowed_at", "$$NOW"]}, "$$NOW"]}},
+            [{"$set": {"next_allowed_at": {"$add": ["$$NOW", int(interval * 1000)]}}}],
+            upsert=True
+        )
+        return 0
+    except DuplicateKeyError:
+        pass
+    # Слот занят: upsert упёрся в существующий документ хоста
+    h = next(db.hosts.aggregate([
+        {"$match": {"_id": host}},
+        {"$project": {"wait_ms": {"$subtract": ["$next_allowed_at", "$$NOW"]}}},
+    ]), {})
+    return max(h.get("wait_ms", 0) / 1000.0, 0.01)
+
+def queue_put(db, source: str, url: str, priority: int = 2, next_fetch_at: int | None = None,
+              shard_cfg: dict | None = None):
     url_norm = normalize_url(url)
     doc = {
         "url_norm": url_norm,
@@ -64,15 +214,27 @@ def queue_put(db, source: str, url: str, priority: int = 2, next_fetch_at: int |
         "updated_at": now_ts(),
         "next_fetch_at": float(next_fetch_at if next_fetch_at is not None else now_ts()),
     }
+    # Без shard_cfg шард проставит backfill_shards при запуске шардированного краулера
+    if shard_cfg is not None:
+        doc["shard"] = shard_of(url_norm, shard_cfg)
+        doc["shard_key"] = shard_key(shard_cfg)
     try:
         db.queue.insert_one(doc)
         return True
     except DuplicateKeyError:
         return False
 
-def get_next_job(db, source_limits: dict):
+def get_next_job(db, source_limits: dict, owned: list | None = None, instance_id: str | None = None):
     current_time = float(now_ts())
     
+    # done-задачи с наступившим next_fetch_at - это плановый перекраул
+    base = {"status": {"$in": ["pending", "done"]}, "next_fetch_at": {"$lte": current_time}}
+    if owned is not None:
+        if not owned:
+            return None
+        base["shard"] = {"$in": owned}
+    claim = {"$set": {"status": "in_progress", "updated_at": now_ts(), "claimed_by": instance_id}}
+    
     pipeline = [
         {
             "$match": {
@@ -104,20 +266,20 @@ def get_next_job(db, source_limits: dict):
         }
     ]
     
+    # Для источника, достигшего лимита, берём только перекраул уже скачанных документов
+    full_sources = [source for source, limit in source_limits.items()
+                    if db.documents.count_documents({"source": source}) >= limit]
+    
     for priority in [1, 2]:  
-        for source, limit in source_limits.items():
-            current_count = db.documents.count_documents({"source": source})
-            if current_count >= limit:
-                continue  
-                
+        for source in source_limits:
             job = db.queue.find_one_and_update(
                 {
-                    "status": "pending", 
-                    "next_fetch_at": {"$lte": current_time},
+                    **base,
                     "source": source,
-                    "priority": priority
+                    "priority": priority,
+                    **({"status": "done"} if source in full_sources else {}),
                 },
-                {"$set": {"status": "in_progress", "updated_at": now_ts()}},
+                claim,
                 sort=[("next_fetch_at", ASCENDING)],
                 return_document=ReturnDocument.AFTER,
             )
@@ -125,19 +287,106 @@ def get_next_job(db, source_limits: dict):
             if job:
                 return job
     
+    if full_sources:
+        base["$or"] = [{"source": {"$nin": full_sources}}, {"status": "done"}]
+    
     return db.queue.find_one_and_update(
-        {"status": "pending", "next_fetch_at": {"$lte": current_time}},
-        {"$set": {"status": "in_progress", "updated_at": now_ts()}},
+        base,
+        claim,
         sort=[("priority", ASCENDING), ("next_fetch_at", ASCENDING)],
         return_document=ReturnDocument.AFTER,
     )
 
-def mark_job(db, url_norm: str, ok: bool, retry_in: int = 30, recrawl_in: int = 60 * 60 * 24 * 30):
+DAY = 60 * 60 * 24
+
+RECRAWL_DEFAULTS = {
+    "initial_days": 7,
+    "min_days": 1,
+    "max_days": 180,
+    "history_size": 20,
+    "max_growth": 2,
+    "budget_per_day": {},
+}
+
+def recrawl_settings(cfg) -> dict:
+    rc = dict(RECRAWL_DEFAULTS)
+    rc.update(cfg["logic"].get("recrawl") or {})
+    return rc
+
+def estimate_change_interval(checks: int, changes: int, observed_seconds: float) -> float | None:
+    # Оценка интенсивности изменений (Cho & Garcia-Molina):
+    # rate = -ln((n - X + 0.5) / (n + 0.5)) / (T / n)
+    # При X = 0 оценка даёт rate = 0, поэтому берём X не меньше 0.5
+    if checks <= 0 or observed_seconds <= 0:
+        return None
+    changes = max(changes, 0.5)
+    rate = -math.log((checks - changes + 0.5) / (checks + 0.5)) * checks / observed_seconds
+    return 1.0 / rate
+
+def recrawl_floors(db, recrawl_cfg: dict) -> dict:
+    # Минимальный интервал перекраула для источника, чтобы уложиться в бюджет запросов в сутки
+    floors = {}
+    for source, budget in (recrawl_cfg.get("budget_per_day") or {}).items():
+        if not budget:
+            continue
+        tracked = db.queue.count_documents({"source": source, "status": "done"})
+        floors[source] = tracked * DAY / float(budget)
+    return floors
+
+def recrawl_interval(checks: int, changes: int, observed_seconds: float,
+                     recrawl_cfg: dict, floor: float = 0, last_gap: float | None = None) -> int:
+    interval = estimate_change_interval(checks, changes, observed_seconds)
+    if interval is None:
+        interval = recrawl_cfg["initial_days"] * DAY
+    if last_gap:
+        # Интервал растёт не быстрее чем в max_growth раз за одну проверку
+        interval = min(interval, last_gap * recrawl_cfg["max_growth"])
+    interval = max(interval, recrawl_cfg["min_days"] * DAY)
+    interval = min(interval, recrawl_cfg["max_days"] * DAY)
+    # Бюджет источника важнее max_days: интервал не опускается ниже floor
+    interval = max(interval, floor)
+    return int(interval)
+
+def mark_job(db, url_norm: str, ok: bool, retry_in: int = 30, recrawl_in: int = DAY * 30,
+             changed: bool | None = None, http_status: int | None = None,
+             recrawl_cfg: dict | None = None, floor: float = 0):
     if ok:
-        db.queue.update_one(
-            {"url_norm": url_norm},
-            {"$set": {"status": "done", "updated_at": now_ts(), "next_fetch_at": float(now_ts() + recrawl_in)}}
-        )
+        ts = now_ts()
+        update = {"$set": {"status": "done", "attempts": 0, "updated_at": ts}}
+        
+        if recrawl_cfg is not None:
+            q = db.queue.find_one(
+                {"url_norm": url_norm},
+                {"checks": 1, "changes": 1, "observed_seconds": 1, "last_checked_at": 1}
+            ) or {}
+            checks = int(q.get("checks", 0))
+            changes = int(q.get("changes", 0))
+            observed = float(q.get("observed_seconds", 0))
+            last_checked = q.get("last_checked_at")
+            last_gap = None
+            
+            if changed is not None and last_checked is not None:
+                checks += 1
+                changes += int(changed)
+                last_gap = max(ts - last_checked, 0)
+                observed += last_gap
+                update["$set"].update({
+                    "checks": checks,
+                    "changes": changes,
+                    "observed_seconds": observed,
+                })
+                if changed:
+                    update["$set"]["last_changed_at"] = ts
+                update["$push"] = {"change_history": {
+                    "$each": [{"at": ts, "changed": bool(changed), "status": http_status}],
+                    "$slice": -int(recrawl_cfg["history_size"]),
+                }}
+            
+            update["$set"]["last_checked_at"] = ts
+            recrawl_in = recrawl_interval(checks, changes, observed, recrawl_cfg, floor, last_gap)
+        
+        update["$set"]["next_fetch_at"] = float(ts + recrawl_in)
+        db.queue.update_one({"url_norm": url_norm}, update)
     else:
         q = db.queue.find_one({"url_norm": url_norm}) or {}
         attempts = int(q.get("attempts", 0)) + 1
@@ -151,7 +400,7 @@ def mark_job(db, url_norm: str, ok: bool, retry_in: int = 30, recrawl_in: int =
             }}
         )
 
-def seed_wikisource_allpages(db, source_cfg, ua: str, limit: int = 40000):
+def seed_wikisource_allpages(db, source_cfg, ua: str, limit: int = 40000, shard_cfg: dict | None = None):
     if db.queue.count_documents({"source": "wikisource_ru"}) > 0:
         logger.info("Wikisource seed уже выполнен, пропускаем")
         return 0
@@ -184,7 +433,7 @@ def seed_wikisource_allpages(db, source_cfg, ua: str, limit: int = 40000):
                 for page in pages:
                     title = page["title"]
                     url = base + title.replace(" ", "_")
-                    queue_put(db, source_cfg["name"], url, priority)
+                    queue_put(db, source_cfg["name"], url, priority, shard_cfg=shard_cfg)
                     inserted += 1
                     
                     if inserted >= limit:
@@ -208,7 +457,7 @@ def seed_wikisource_allpages(db, source_cfg, ua: str, limit: int = 40000):
     logger.info(f"Добавлено {inserted} URL из wikisource")
     return inserted
 
-def seed_libru_initial(db, source_cfg):
+def seed_libru_initial(db, source_cfg, shard_cfg: dict | None = None):
     if db.queue.count_documents({"source": "libru"}) > 0:
         logger.info("Lib.ru seed уже выполнен, пропускаем")
         return 0
@@ -217,40 +466,102 @@ def seed_libru_initial(db, source_cfg):
     added = 0
     
     for url in source_cfg["seed"].get("urls", []):
-        if queue_put(db, source_cfg["name"], url, priority):
+        if queue_put(db, source_cfg["name"], url, priority, shard_cfg=shard_cfg):
             added += 1
     
     logger.info(f"Добавлено {added} начальных URL из lib.ru")
     return added
 
-def extract_links_from_html(html: str, base_url: str, source: str):
+HREF_RE = re.compile(r'href="([^"]*)"', re.IGNORECASE)
+SCHEME_RE = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*:')
+SKIP_PREFIXES = ('#', 'javascript:', 'mailto:')
+# То же, что urlsplit убирает из URL до разбора: ведущие управляющие символы и пробелы, \t\r\n
+HREF_LEADING_JUNK = "".join(chr(c) for c in range(0x21))
+HREF_UNSAFE = str.maketrans("", "", "\t\r\n")
+
+def host_in_scope(hostname: str | None, hosts: tuple) -> bool:
+    return bool(hostname) and any(hostname == h or hostname.endswith("." + h) for h in hosts)
+
+def url_in_scope(url: str, hosts: tuple) -> bool:
+    return bool(hosts) and host_in_scope(urlsplit(url).hostname, hosts)
+
+def link_bases(base_url: str) -> dict:
+    # База, от которой реально зависит результат urljoin для каждого вида ссылки
+    parts = urlsplit(base_url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    path = parts.path or "/"
+    return {
+        "scheme": f"{parts.scheme}:",
+        "origin": origin,
+        "directory": origin + path[:path.rfind("/") + 1],
+        "page": urlunsplit((parts.scheme, parts.netloc, path, parts.query, "")),
+    }
+
+def link_base(bases: dict, href: str) -> str:
+    if SCHEME_RE.match(href):
+        return ""
+    if href.startswith("//"):
+        # Пустой хост ("///x", "//?q"): urljoin берёт хост и путь страницы
+        if not re.match(r"//[^/?#]", href):
+            return bases["page"]
+        return bases["scheme"]
+    if href.startswith("/"):
+        return bases["origin"]
+    if href.startswith("?"):
+        return bases["page"]
+    return bases["directory"]
+
+@lru_cache(maxsize=65536)
+def resolve_link(base: str, href: str, hosts: tuple) -> str | None:
+    # base - каталог/хост страницы, а не её полный URL, поэтому навигационные
+    # ссылки, одинаковые на всех страницах каталога, попадают в кеш
+    if href.startswith(SKIP_PREFIXES):
+        return None
+    
+    # Ранний фильтр: для абсолютных ссылок хост проверяется до urljoin
+    if not base or base.endswith(":"):
+        if not host_in_scope(urlsplit(href).hostname, hosts):
+            return None
+    
+    full_url = urljoin(base, href)
+    parts = urlsplit(full_url)
+    if parts.scheme not in ("http", "https") or not host_in_scope(parts.hostname, hosts):
+        return None
+    return normalize_url(full_url)
+
+def extract_links_from_html(html: str, base_url: str, source: str, hosts: tuple):
     links = set()
+    bases = link_bases(base_url)
     
-    for match in re.finditer(r'href="([^"]*)"', html, re.IGNORECASE):
-        href = match.group(1)
-        
-        if not href or href.startswith(('#', 'javascript:', 'mailto:')):
+    for href in set(HREF_RE.findall(html)):
+        # Чистим href до выбора базы, иначе " ?q=1" уйдёт в кеш с базой-каталогом
+        href = href.lstrip(HREF_LEADING_JUNK).translate(HREF_UNSAFE)
+        if not href:
             continue
-        
-        full_url = urljoin(base_url, href)
-        if 'lib.ru' in full_url:
-            norm_url = normalize_url(full_url)
+        norm_url = resolve_link(link_base(bases, href), href, hosts)
+        if norm_url:
             links.add(norm_url)
     
     return list(links)
 
-def worker(worker_id, cfg, db, stop_event, stats, source_limits):
+def worker(worker_id, cfg, db, stop_event, stats, source_limits, floors, coordinator=None):
     session = requests.Session()
     ua = cfg["logic"]["user_agent"]
     timeout = cfg["logic"]["timeout_seconds"]
     max_retries = cfg["logic"]["max_retries"]
     delay = cfg["logic"]["delay_seconds"]
+    recrawl_cfg = recrawl_settings(cfg)
+    shard_cfg = shard_settings(cfg)
+    link_hosts = {s_cfg["name"]: tuple(s_cfg.get("link_hosts", [])) for s_cfg in cfg["sources"]}
     
     empty_cycles = 0
     
     while not stop_event.is_set():
         try:
-            job = get_next_job(db, source_limits)
+            if coordinator:
+                job = get_next_job(db, source_limits, coordinator.owned(), coordinator.instance_id)
+            else:
+                job = get_next_job(db, source_limits)
             
             if not job:
                 empty_cycles += 1
@@ -266,17 +577,35 @@ def worker(worker_id, cfg, db, stop_event, stats, source_limits):
             url_norm = job["url_norm"]
             source = job["source"]
             
+            prev = db.documents.find_one({"url_norm": url_norm}, 
+                                        {"etag": 1, "last_modified": 1, "content_hash": 1})
+            
+            # Перекраул уже сохранённого документа не увеличивает число документов
             source_doc_count = db.documents.count_documents({"source": source})
-            if source_doc_count >= source_limits.get(source, 999999):
+            if not prev and source_doc_count >= source_limits.get(source, 999999):
                 logger.debug(f"Worker {worker_id}: лимит для {source} достигнут")
                 mark_job(db, url_norm, ok=False, retry_in=300)  
                 continue
-            
-            prev = db.documents.find_one({"url_norm": url_norm}, 
-                                        {"etag": 1, "last_modified": 1, "content_hash": 1})
             etag = prev.get("etag") if prev else None
             last_modified = prev.get("last_modified") if prev else None
             
+            host_interval = shard_cfg["host_interval_seconds"]
+            if shard_cfg["enabled"] and host_interval > 0:
+                host = urlsplit(url_norm).netloc
+                while not stop_event.is_set():
+                    wait = acquire_host_slot(db, host, host_interval)
+                    if not wait:
+                        break
+                    time.sleep(wait)
+                
+                if stop_event.is_set():
+                    # Слот не получен: возвращаем задачу в очередь без попытки
+                    db.queue.update_one(
+                        {"url_norm": url_norm},
+                        {"$set": {"status": "pending", "updated_at": now_ts()}}
+                    )
+                    break
+            
             try:
                 headers = {"User-Agent": ua}
                 if etag:
@@ -292,7 +621,8 @@ def worker(worker_id, cfg, db, stop_event, stats, source_limits):
                         {"$set": {"fetched_at": now_ts()}},
                         upsert=True
                     )
-                    mark_job(db, url_norm, ok=True)
+                    mark_job(db, url_norm, ok=True, changed=False, http_status=304,
+                             recrawl_cfg=recrawl_cfg, floor=floors.get(source, 0))
                     stats[f"{source}_304"] = stats.get(f"{source}_304", 0) + 1
                     
                 elif r.status_code == 200:
@@ -320,13 +650,14 @@ def worker(worker_id, cfg, db, stop_event, stats, source_limits):
                         )
                         stats[f"{source}_new"] = stats.get(f"{source}_new", 0) + 1
                         
-                        if source == "libru" and "lib.ru" in url:
+                        hosts = link_hosts.get(source, ())
+                        if url_in_scope(url, hosts):
                             try:
-                                new_links = extract_links_from_html(html, url, source)
+                                new_links = extract_links_from_html(html, url, source, hosts)
                                 added_links = 0
                                 
                                 for link_url in new_links:
-                                    if queue_put(db, source, link_url, priority=2):
+                                    if queue_put(db, source, link_url, priority=2, shard_cfg=shard_cfg):
                                         added_links += 1
                                 
                                 if added_links > 0:
@@ -344,7 +675,9 @@ def worker(worker_id, cfg, db, stop_event, stats, source_limits):
                         )
                         stats[f"{source}_cached"] = stats.get(f"{source}_cached", 0) + 1
                     
-                    mark_job(db, url_norm, ok=True)
+                    mark_job(db, url_norm, ok=True, changed=changed if prev else None,
+                             http_status=200, recrawl_cfg=recrawl_cfg,
+                             floor=floors.get(source, 0))
                     
                 else:
                     attempts = int(job.get("attempts", 0))
@@ -379,13 +712,25 @@ def worker(worker_id, cfg, db, stop_event, stats, source_limits):
     
     logger.info(f"Worker {worker_id} остановлен")
 
-def main(cfg_path: str):
+def main(cfg_path: str, do_seed: bool = True):
     with open(cfg_path, "r", encoding="utf-8") as f:
         cfg = yaml.safe_load(f)
     
     client = MongoClient(cfg["db"]["uri"])
     db = client[cfg["db"]["name"]]
     ensure_indexes(db)
+    recrawl_cfg = recrawl_settings(cfg)
+    floors = recrawl_floors(db, recrawl_cfg)
+    shard_cfg = shard_settings(cfg)
+    
+    coordinator = None
+    if shard_cfg["enabled"]:
+        if do_seed:
+            backfilled = backfill_shards(db, shard_cfg)
+            if backfilled:
+                logger.info(f"Проставлен шард для {backfilled} задач")
+        coordinator = ShardCoordinator(db, shard_cfg)
+        coordinator.start()
     
     print("=" * 70)
     print("УНИВИРСАЛЬНЫЙ КРАУЛЕР - WIKISOURCE + LIB.RU")
@@ -405,6 +750,11 @@ def main(cfg_path: str):
     print(f"   - Всего цель: {max_docs} документов")
     print(f"   - Потоков: {cfg['logic'].get('threads', 1)}")
     print(f"   - Задержка: {cfg['logic']['delay_seconds']} сек")
+    if coordinator:
+        print(f"   - Шард: {coordinator.instance_id}, партиций {len(coordinator.owned())}"
+              f"/{shard_cfg['partitions']}")
+    print(f"   - Перекраул: {recrawl_cfg['min_days']}-{recrawl_cfg['max_days']} дней "
+          f"(первый через {recrawl_cfg['initial_days']})")
     
     print("Текущее состояние:")
     
@@ -424,7 +774,7 @@ def main(cfg_path: str):
     print(f"   - wikisource_ru pending: {pending_wiki}")
     print(f"   - lib.ru pending: {pending_libru}")
     
-    need_seed = total_queue < 1000  
+    need_seed = do_seed and total_queue < 1000  
     
     if need_seed:
         print("\n Выполняем seed...")
@@ -441,11 +791,11 @@ def main(cfg_path: str):
             if seed_type == "mediawiki_api_allpages" and wikisource_docs < wikisource_target:
                 print(f"  Добавляем URL из wikisource...")
                 seed_wikisource_allpages(db, s_cfg, cfg["logic"]["user_agent"], 
-                                        limit=wikisource_target * 2)
+                                        limit=wikisource_target * 2, shard_cfg=shard_cfg)
                 
             elif seed_type == "url_list" and libru_docs < libru_target:
                 print(f"  Добавляем URL из lib.ru...")
-                seed_libru_initial(db, s_cfg)
+                seed_libru_initial(db, s_cfg, shard_cfg)
     
     pending_wiki = db.queue.count_documents({"source": "wikisource_ru", "status": "pending"})
     pending_libru = db.queue.count_documents({"source": "libru", "status": "pending"})
@@ -465,7 +815,7 @@ def main(cfg_path: str):
         
         for i in range(num_threads):
             future = executor.submit(worker, i, cfg, db, stop_event, 
-                                   stats_list[i], source_limits)
+                                   stats_list[i], source_limits, floors, coordinator)
             futures.append(future)
         
         try:
@@ -496,25 +846,30 @@ def main(cfg_path: str):
                     print(f"   Очередь: {pending_total} pending, {done_total} done")
                     print(f"   Скорость: {docs_per_hour:.1f} док/час")
                     
+                    floors.update(recrawl_floors(db, recrawl_cfg))
                     last_stats_time = current_time
                 
                 wikisource_current = db.documents.count_documents({"source": "wikisource_ru"})
                 libru_current = db.documents.count_documents({"source": "libru"})
                 total_current = wikisource_current + libru_current
                 
-                if total_current >= max_docs:
+                recrawl_due = db.queue.count_documents(
+                    {"status": "done", "next_fetch_at": {"$lte": float(now_ts())}}
+                )
+                if total_current >= max_docs and not recrawl_due:
                     print(f"\nЦЕЛЬ ДОСТИГНУТА: {total_current}/{max_docs} документов!")
                     stop_event.set()
                     break
                 
-                if (wikisource_current >= wikisource_target * 0.9 and 
+                if (do_seed and
+                    wikisource_current >= wikisource_target * 0.9 and 
                     libru_current < libru_target and 
                     db.queue.count_documents({"source": "libru", "status": "pending"}) < 1000):
                     
                     print("Добавляем дополнительные seed URL для lib.ru...")
                     for s_cfg in cfg["sources"]:
                         if s_cfg["name"] == "libru":
-                            seed_libru_initial(db, s_cfg)
+                            seed_libru_initial(db, s_cfg, shard_cfg)
                 
                 time.sleep(5)
                 
@@ -538,6 +893,9 @@ def main(cfg_path: str):
             except Exception as e:
                 logger.error(f"Ошибка воркера: {e}")
     
+    if coordinator:
+        coordinator.stop()
+    
     print("\n" + "=" * 70)
     print("ФИНАЛЬНАЯ СТАТИСТИКА")
     print("=" * 70)
@@ -589,11 +947,30 @@ def main(cfg_path: str):
     
     client.close()
 
+def run_processes(cfg_path: str, processes: int):
+    # Каждый процесс - отдельный шард со своим MongoClient; seed делает только первый
+    procs = [multiprocessing.Process(target=main, args=(cfg_path, i == 0)) for i in range(processes)]
+    for proc in procs:
+        proc.start()
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.join()
+
 if __name__ == "__main__":
     logging.getLogger().setLevel(logging.WARNING)
     
     try:
-        main(sys.argv[1])
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            shard_cfg = shard_settings(yaml.safe_load(f))
+        processes = int(sys.argv[2]) if len(sys.argv) > 2 else shard_cfg["processes"]
+        
+        if processes > 1 and shard_cfg["enabled"]:
+            run_processes(sys.argv[1], processes)
+        else:
+            main(sys.argv[1])
     except Exception as e:
         print(f" ошибка: {e}")
         traceback.print_exc()
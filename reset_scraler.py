@@ -1,30 +1,164 @@
-from pymongo import MongoClient
+import argparse
+import os
 import sys
+import time
+
+import yaml
+from pymongo import MongoClient
+
+from multi_scraler import ensure_indexes, now_ts
+from clean_texts import ensure_clean_indexes
+
+CRAWL_COLLECTIONS = ["documents", "queue", "documents_clean", "crawlers", "hosts"]
 
-def reset_database(db_name="lab_corpus"):
-    client = MongoClient("mongodb://localhost:27017")
-    db = client[db_name]
-    
+def connect(cfg_path: str):
+    uri, name = "mongodb://localhost:27017", "lab_corpus"
+    if cfg_path and os.path.exists(cfg_path):
+        with open(cfg_path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        uri, name = cfg["db"]["uri"], cfg["db"]["name"]
+    client = MongoClient(uri)
+    return client, client[name]
+
+def confirm(args, question: str) -> bool:
+    if args.yes:
+        return True
+    confirmation = input(f"{question} ARE U SHURE??????. (yeeeeah/no): ")
+    return confirmation.lower() == 'yeeeeah'
+
+def human_size(n: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def reset_database(db, args):
     print("=" * 60)
     print("Чистка бд")
     print("=" * 60)
-    
-    confirmation = input("ARE U SHURE??????. (yeeeeah/no): ")
-    if confirmation.lower() != 'yeeeeah':
+
+    if not confirm(args, "Будут удалены коллекции " + ", ".join(CRAWL_COLLECTIONS) + "."):
         print("Отменено.")
         return
-    
-    collections = db.list_collection_names()
-    
-    for collection in collections:
-        if collection in ['documents', 'queue']:
-            result = db[collection].delete_many({})
-            print(f"✓ Очищена коллекция '{collection}': удалено {result.deleted_count} записей")
-    
+
+    existing = set(db.list_collection_names())
+    for collection in CRAWL_COLLECTIONS:
+        if collection in existing:
+            # drop вместо delete_many: мгновенно и без фрагментации хранилища
+            db.drop_collection(collection)
+            print(f"✓ Удалена коллекция '{collection}'")
+
+    ensure_indexes(db)
+    ensure_clean_indexes(db)
+    print("✓ Индексы пересозданы")
+
     print("\nБаза данных полностью очищена.")
     print("=" * 60)
-    
-    client.close()
+
+def requeue(db, args):
+    query = {"status": {"$in": args.status}}
+    if args.source:
+        query["source"] = {"$in": args.source}
+
+    matched = db.queue.count_documents(query)
+    print(f"Задач под условие {query}: {matched}")
+    if not matched or not confirm(args, f"Вернуть в очередь {matched} задач?"):
+        print("Отменено.")
+        return
+
+    start = float(now_ts() + args.delay)
+    if args.spread > 0:
+        # Разносим повторные выборки по окну spread секунд, чтобы не было всплеска запросов
+        next_fetch_at = {"$add": [start, {"$multiply": [{"$rand": {}}, args.spread]}]}
+    else:
+        next_fetch_at = start
+
+    result = db.queue.update_many(query, [
+        {"$set": {
+            "status": "pending",
+            "attempts": 0,
+            "updated_at": now_ts(),
+            "next_fetch_at": next_fetch_at,
+        }},
+        {"$unset": ["error", "claimed_by"]},
+    ])
+    print(f"✓ Возвращено в очередь: {result.modified_count}")
+
+def collection_stats(db, names):
+    rows = []
+    for name in names:
+        s = db.command("collStats", name)
+        rows.append((name, s.get("count", 0), s.get("size", 0),
+                     s.get("storageSize", 0), s.get("totalIndexSize", 0)))
+    return rows
+
+def select_collections(db, requested, default):
+    existing = set(db.list_collection_names())
+    if not requested:
+        return [c for c in default if c in existing]
+    for name in requested:
+        if name not in existing:
+            print(f"✗ Коллекции '{name}' нет, пропускаем")
+    return [c for c in requested if c in existing]
+
+def print_stats(db, args):
+    names = select_collections(db, args.collections, sorted(db.list_collection_names()))
+    if not names:
+        return
+    print(f"{'коллекция':<18}{'записей':>12}{'данные':>14}{'на диске':>14}{'индексы':>14}")
+    for name, count, size, storage, index in collection_stats(db, names):
+        print(f"{name:<18}{count:>12}{human_size(size):>14}"
+              f"{human_size(storage):>14}{human_size(index):>14}")
+
+def compact(db, args):
+    names = select_collections(db, args.collections, CRAWL_COLLECTIONS)
+    if not names:
+        return
+    if not confirm(args, "compact блокирует запись в коллекции на время работы."):
+        print("Отменено.")
+        return
+
+    before = {row[0]: row[3] for row in collection_stats(db, names)}
+    for name in names:
+        started = time.time()
+        db.command("compact", name)
+        after = db.command("collStats", name).get("storageSize", 0)
+        print(f"✓ {name}: {human_size(before[name])} -> {human_size(after)} "
+              f"({time.time() - started:.1f} сек)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обслуживание базы краулера")
+    parser.add_argument("--config", default="config.yaml", help="путь к config.yaml")
+    parser.add_argument("-y", "--yes", action="store_true", help="без подтверждений (для скриптов)")
+    # -y принимается и после подкоманды; SUPPRESS не затирает значение, заданное до неё
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-y", "--yes", action="store_true", default=argparse.SUPPRESS,
+                        help="без подтверждений (для скриптов)")
+    sub = parser.add_subparsers(dest="command")
+
+    sub.add_parser("reset", parents=[common], help="удалить и пересоздать коллекции с индексами")
+
+    p = sub.add_parser("requeue", parents=[common], help="вернуть задачи в очередь")
+    p.add_argument("--status", nargs="+", default=["error"], help="статусы задач (по умолчанию error)")
+    p.add_argument("--source", nargs="+", help="только для указанных источников")
+    p.add_argument("--delay", type=int, default=0, help="через сколько секунд начать выборку")
+    p.add_argument("--spread", type=int, default=0, help="окно в секундах для разнесения выборок")
+
+    p = sub.add_parser("stats", parents=[common], help="размеры коллекций")
+    p.add_argument("collections", nargs="*")
+
+    p = sub.add_parser("compact", parents=[common], help="дефрагментация коллекций")
+    p.add_argument("collections", nargs="*")
+
+    args = parser.parse_args(argv)
+    commands = {"reset": reset_database, "requeue": requeue, "stats": print_stats, "compact": compact}
+
+    client, db = connect(args.config)
+    try:
+        commands[args.command or "reset"](db, args)
+    finally:
+        client.close()
 
 if __name__ == "__main__":
-    reset_database()
\ No newline at end of file
+    sys.exit(main())